@@ -0,0 +1,46 @@
+from typing import Tuple
+
+import numpy as np
+from numba import njit
+
+
+# Status code recorded for requests that failed without a response
+ERROR_STATUS = -1
+
+
+def _is_error_py(status: int) -> bool:
+    """Return whether a status code counts as an error: a 4xx or 5xx response, or no response at all."""
+    return status == ERROR_STATUS or 400 <= status < 600
+
+
+# Compiled for use inside the kernels; Python callers should use _is_error_py, which skips numba's dispatch
+is_error = njit(cache=True)(_is_error_py)
+
+
+@njit(cache=True, fastmath=True)
+def summarize(lat: np.ndarray, status: np.ndarray) -> Tuple[float, float, float, int]:
+    """
+    Compute the latency sum, minimum and maximum and the error count in a single pass over the results.
+
+    Args:
+        lat (np.ndarray): The latencies of the requests.
+        status (np.ndarray): The status codes of the requests, with ERROR_STATUS for requests that failed without
+            a response.
+
+    Returns:
+        Tuple[float, float, float, int]: The sum, minimum and maximum of the latencies and the number of errors.
+    """
+    total = 0.0
+    mn = np.inf
+    mx = -np.inf
+    errors = 0
+    for i in range(lat.shape[0]):
+        value = lat[i]
+        total += value
+        if value < mn:
+            mn = value
+        if value > mx:
+            mx = value
+        if is_error(status[i]):
+            errors += 1
+    return total, mn, mx, errors
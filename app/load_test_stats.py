@@ -1,13 +1,54 @@
-from statistics import mean, median
-from typing import Dict, List
-from collections import defaultdict
+import asyncio
+import sys
+from typing import Dict, Optional
+
+import numpy as np
+
+from app._stats_kernel import ERROR_STATUS, _is_error_py, summarize
+
+# Interned string forms of the valid HTTP status codes, used as the keys of the status distribution
+_STATUS_STR: Dict[int, str] = {i: sys.intern(str(i)) for i in range(100, 600)}
 
 
 class LoadTestStats:
     """A class to hold and calculate statistics for the load tester."""
 
-    def __init__(self):
-        self.results: Dict[str, List[float]] = defaultdict(list)
+    # Status code recorded for requests that failed without a response
+    ERROR_STATUS = ERROR_STATUS
+
+    def __init__(self, initial_capacity: int = 1024):
+        # Results are stored as parallel arrays of latencies and status codes, of which the first _n entries are used
+        self._lat = np.empty(initial_capacity, dtype=np.float64)
+        self._status = np.empty(initial_capacity, dtype=np.int16)
+        self.reset()
+
+    def reset(self, max_error_rate: Optional[float] = None, max_latency: Optional[float] = None,
+              expected_requests: Optional[int] = None) -> None:
+        """
+        Discard all results and statistics so the instance can be reused for another test.
+
+        The result arrays are kept at their current size, so they only ever grow to the largest test run.
+
+        If the number of requests the test will make is given, the test is flagged as aborted as soon as the
+        results so far guarantee that it will exceed max_error_rate or max_latency, whatever the remaining
+        requests return.
+
+        Args:
+            max_error_rate (Optional[float]): The maximum acceptable error rate of the whole test.
+            max_latency (Optional[float]): The maximum acceptable mean latency of the whole test in seconds.
+            expected_requests (Optional[int]): The number of requests the test will make.
+        """
+        self._n = 0
+        self._check_abort = expected_requests is not None and (max_error_rate is not None or max_latency is not None)
+        # Budgets for the whole test: exceeding either one means the test has failed
+        self._error_budget = (max_error_rate * expected_requests
+                              if self._check_abort and max_error_rate is not None else float('inf'))
+        self._latency_budget = (max_latency * expected_requests
+                                if self._check_abort and max_latency is not None else float('inf'))
+        self._errors = 0
+        self._latency_sum = 0.0
+        self._abort_event: Optional[asyncio.Event] = None
+        self.aborted = False
         self.total_requests: int = 0
         self.total_errors: int = 0
         self.error_rate: float = 0.0
@@ -18,25 +59,86 @@ class LoadTestStats:
         self.max_latency = -1
         self.error_set = set()
 
+    def _grow(self) -> None:
+        """Double the capacity of the result arrays."""
+        capacity = 2 * max(len(self._lat), 1)
+        lat = np.empty(capacity, dtype=np.float64)
+        status = np.empty(capacity, dtype=np.int16)
+        lat[:self._n] = self._lat[:self._n]
+        status[:self._n] = self._status[:self._n]
+        self._lat, self._status = lat, status
+
+    @staticmethod
+    def _median(values: np.ndarray) -> float:
+        """Return the median of a non-empty array by partitioning around its middle instead of sorting it."""
+        k = len(values) // 2
+        if len(values) % 2:
+            return float(np.partition(values, k)[k])
+        part = np.partition(values, (k - 1, k))
+        return float(0.5 * (part[k - 1] + part[k]))
+
     def add_result(self, status: str, latency: float) -> None:
         """Add a single result to the stats."""
-        self.results[status].append(latency)
+        self.add_result_int(self.ERROR_STATUS if status == 'error' else int(status), latency)
+
+    def add_result_int(self, status: int, latency: float) -> None:
+        """Add a single result to the stats, given its integer status code (ERROR_STATUS for a failed request)."""
+        i = self._n
+        if i == len(self._lat):
+            self._grow()
+        self._lat[i] = latency
+        self._status[i] = status
+        self._n = i + 1
+        if self._check_abort:
+            self._update_aborted(status, latency)
+
+    def _update_aborted(self, status: int, latency: float) -> None:
+        """Keep running totals of the results and flag the test as aborted once it is certain to fail."""
+        if _is_error_py(status):
+            self._errors += 1
+        self._latency_sum += latency
+        if self._errors > self._error_budget or self._latency_sum > self._latency_budget:
+            self.abort()
+
+    def abort(self) -> None:
+        """Flag the test as aborted and set its abort event, if one has been created."""
+        self.aborted = True
+        if self._abort_event is not None:
+            self._abort_event.set()
+
+    def abort_event(self) -> asyncio.Event:
+        """
+        Return an event that is set when the test is aborted.
+
+        The event is created on first use rather than in reset(), so that it belongs to the running event loop.
+
+        Returns:
+            asyncio.Event: The abort event of the current test.
+        """
+        if self._abort_event is None:
+            self._abort_event = asyncio.Event()
+            if self.aborted:
+                self._abort_event.set()
+        return self._abort_event
 
     def calculate_stats(self) -> None:
         """Calculate all statistics based on the collected results."""
-        all_latencies: List[float] = []
-        self.total_errors = 0
-        for status, latencies in self.results.items():
-            all_latencies.extend(latencies)
-            if status.startswith('4') or status.startswith('5') or status == 'error':
-                self.total_errors += len(latencies)
-
-        self.total_requests = len(all_latencies)
+        lat = self._lat[:self._n]
+        status = self._status[:self._n]
+        total, min_latency, max_latency, self.total_errors = summarize(lat, status)
+
+        self.total_requests = self._n
         self.error_rate = self.total_errors / self.total_requests if self.total_requests > 0 else 0
-        self.status_distribution = {status: len(latencies) for status, latencies in self.results.items()}
 
-        if all_latencies:
-            self.mean_latency = mean(all_latencies)
-            self.median_latency = median(all_latencies)
-            self.min_latency = min(all_latencies)
-            self.max_latency = max(all_latencies)
+        # Histogram of the status codes, shifted by one so that ERROR_STATUS is counted at index 0
+        counts = np.bincount(status.astype(np.int32) + 1)
+        self.status_distribution = {_STATUS_STR.get(code) or str(code): int(counts[code + 1])
+                                    for code in np.flatnonzero(counts[1:]).tolist()}
+        if len(counts) and counts[0]:
+            self.status_distribution['error'] = int(counts[0])
+
+        if self._n:
+            self.mean_latency = total / self._n
+            self.median_latency = self._median(lat)
+            self.min_latency = min_latency
+            self.max_latency = max_latency
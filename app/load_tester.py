@@ -2,6 +2,7 @@ import asyncio
 import sys
 import aiohttp
 import argparse
+import math
 import time
 from typing import Tuple, Optional
 
@@ -10,7 +11,7 @@ from app.load_test_stats import LoadTestStats
 class HTTPLoadTester:
     """A class for performing HTTP load testing and optionally determining server breaking point."""
 
-    def __init__(self, url: str, qps: Optional[int] = None, verbose: bool = False, retries: int = 5) -> None:
+    def __init__(self, url: str, qps: Optional[int] = None, verbose: bool = False, *, timeout: float = 30.0) -> None:
         """
         Initialize the HTTPLoadTester.
 
@@ -18,42 +19,92 @@ class HTTPLoadTester:
             url (str): The URL to test.
             qps (Optional[int]): The number of queries per second to perform (if running a single test).
             verbose (bool): Whether to print verbose output.
-            retries (int): Number of retry attempts for a failed request.
+            timeout (float): Total timeout in seconds for a single request.
         """
         self.url: str = url
         self.qps: Optional[int] = qps
         self.verbose: bool = verbose
-        self.retries: int = retries
+        self.timeout: float = timeout
         self.load_test_stats = LoadTestStats()
+        self._connector: Optional[aiohttp.TCPConnector] = None
 
-    async def make_request(self, session: aiohttp.ClientSession) -> None:
+    async def _get_connector(self) -> aiohttp.TCPConnector:
         """
-        Make a single HTTP request and record the results with retry logic.
+        Return the shared connector, creating it on first use.
+
+        A single connector (and therefore a single connection pool) is shared by the sessions of every test
+        so that keep-alive connections and cached DNS lookups carry over between requests and between tests.
+
+        Returns:
+            aiohttp.TCPConnector: The shared connector.
+        """
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(limit=0, limit_per_host=0, ttl_dns_cache=300,
+                                                   enable_cleanup_closed=True)
+        return self._connector
+
+    async def aclose(self) -> None:
+        """Close the shared connector and its connection pool."""
+        if self._connector is not None:
+            await self._connector.close()
+            self._connector = None
+
+    async def make_request(self, session: aiohttp.ClientSession, start_time: Optional[float] = None) -> None:
+        """
+        Make a single HTTP request and record the results.
+
+        A failed request is recorded as an error rather than retried, since retrying would hide the failure
+        and delay the measurement.
 
         Args:
             session (aiohttp.ClientSession): The session to use for the request.
+            start_time (Optional[float]): The time.perf_counter() time the request was scheduled for, which its
+                latency is measured from. If None, the latency is measured from when the request is made.
+        """
+        if start_time is None:
+            start_time = time.perf_counter()
+        try:
+            async with session.get(self.url) as response:
+                latency: float = time.perf_counter() - start_time
+                # Drain the body as raw bytes so the connection goes back to the pool without decoding it.
+                # Reading it (rather than calling response.release()) still detects truncated bodies.
+                await response.read()
+                self.load_test_stats.add_result_int(response.status, latency)
+        except Exception as e:
+            self.load_test_stats.add_result_int(LoadTestStats.ERROR_STATUS, time.perf_counter() - start_time)
+            self.load_test_stats.error_set.add(str(e))
+            if self.verbose:
+                print("Error received from request:", str(e))
+
+    async def _worker(self, session: aiohttp.ClientSession, queue: asyncio.Queue) -> None:
         """
-        start_time: float = time.perf_counter()
-        for attempt in range(self.retries):
+        Make one request for every scheduled start time taken from the queue, until cancelled.
+
+        Args:
+            session (aiohttp.ClientSession): The session to use for the requests.
+            queue (asyncio.Queue): The queue the scheduler puts the start time of each scheduled request on.
+        """
+        while True:
+            start_time = await queue.get()
             try:
-                async with session.get(self.url) as response:
-                    latency: float = time.perf_counter() - start_time
-                    await response.text()
-                    self.load_test_stats.results[str(response.status)].append(latency)
-                    return
-            except Exception as e:
-                if attempt < self.retries - 1:
-                    await asyncio.sleep(2 ** attempt)  # Exponential backoff
-                else:
-                    self.load_test_stats.results['error'].append(time.perf_counter() - start_time)
-                    self.load_test_stats.error_set.add(str(e))
-                    if self.verbose: 
-                        print("Error received from request:", str(e))
+                await self.make_request(session, start_time)
+            finally:
+                queue.task_done()
 
     async def generate_load(self, duration: int, qps: Optional[int] = None) -> None:
         """
         Generate load by making multiple requests per second for a specified duration.
 
+        Requests are made by a pool of worker tasks, which the scheduler feeds through a queue instead of
+        creating a new task for every request. The pool starts with one worker per unit of QPS and the scheduler
+        adds a worker whenever requests are waiting for one, up to QPS times the request timeout (the most
+        requests that can be in flight at once), so a slow server doesn't lower the QPS actually sent.
+
+        Requests are scheduled on the time.perf_counter() clock, at fixed offsets from the start of the test,
+        and their latencies are measured from the time they were scheduled for on that same clock. If the stats
+        flag the test as aborted, whether while requests are still being scheduled or while the last of them
+        are completing, scheduling stops and the requests still in flight are cancelled.
+
         Args:
             duration (int): The duration of the test in seconds.
             qps (Optional[int]): The number of queries per second to perform. If None, uses self.qps.
@@ -62,44 +113,110 @@ class HTTPLoadTester:
         if qps is None:
             raise ValueError("QPS must be specified either in the constructor or as a method argument")
 
-        async with aiohttp.ClientSession() as session:
-            start_time = time.time()
-            end_time = start_time + duration
+        # A fresh session per test keeps cookies and other client state from carrying over between tests,
+        # while the shared connector keeps its pool of open connections
+        async with aiohttp.ClientSession(connector=await self._get_connector(), connector_owner=False,
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            # The queue is unbounded so that the scheduler never blocks on it and keeps to its schedule
+            queue: asyncio.Queue = asyncio.Queue()
+            workers = [asyncio.create_task(self._worker(session, queue)) for _ in range(qps)]
+            max_workers = qps * max(math.ceil(self.timeout), 1)
+
+            # Bind the names used in the pacing loop to locals so they aren't looked up on every iteration.
+            # The loop clock isn't used for pacing: under uvloop it only has millisecond resolution.
+            _time = time.perf_counter
+            _sleep = asyncio.sleep
+            _put_nowait = queue.put_nowait
+            _qsize = queue.qsize
+            stats = self.load_test_stats
+            abort_event = stats.abort_event()
+
+            total_requests = qps * duration
             interval = 1 / qps
+            start_time = _time()
             next_request_time = start_time
+            requests_sent = 0
 
-            while time.time() < end_time:
-                current_time = time.time()
-                if current_time >= next_request_time:
-                    if current_time < end_time:
-                        asyncio.create_task(self.make_request(session))
-                        next_request_time += interval
-                    await asyncio.sleep(0)  # Yield control to allow other tasks to run
-                else:
-                    await asyncio.sleep(next_request_time - current_time)
+            try:
+                while requests_sent < total_requests and not stats.aborted:
+                    current_time = _time()
+                    if current_time >= next_request_time:
+                        _put_nowait(next_request_time)
+                        requests_sent += 1
+                        # Computed from the start rather than accumulated, so rounding errors don't add up
+                        next_request_time = start_time + requests_sent * interval
+                        await _sleep(0)  # Yield control to allow the workers to run
+                        # A request still waiting in the queue means every worker is busy
+                        if _qsize() and len(workers) < max_workers:
+                            workers.append(asyncio.create_task(self._worker(session, queue)))
+                    else:
+                        await _sleep(next_request_time - current_time)
 
-        # Wait for any remaining tasks to complete
-        await asyncio.gather(*asyncio.all_tasks() - {asyncio.current_task()})
+                # Wait for every scheduled request to complete, unless the test has already failed or fails first
+                if not stats.aborted:
+                    join_task = asyncio.ensure_future(queue.join())
+                    abort_task = asyncio.ensure_future(abort_event.wait())
+                    try:
+                        await asyncio.wait({join_task, abort_task}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        join_task.cancel()
+                        abort_task.cancel()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
 
-    async def run_test(self, duration: int, qps: Optional[int] = None) -> Tuple[float, float]:
+    async def run_test(self, duration: int, qps: Optional[int] = None, max_error_rate: Optional[float] = None,
+                       max_latency: Optional[float] = None) -> Tuple[float, float]:
         """
         Run a single load test with specified QPS and duration.
 
         Args:
             duration (int): The duration of the test in seconds.
             qps (Optional[int]): The number of queries per second to perform. If None, uses self.qps.
+            max_error_rate (Optional[float]): If given, the test is aborted early once its error rate is certain
+                to end up above this threshold.
+            max_latency (Optional[float]): If given, the test is aborted early once its mean latency is certain
+                to end up above this threshold.
 
         Returns:
-            Tuple[float, float]: The error rate and mean latency of the test.
+            Tuple[float, float]: The error rate and mean latency of the test, from the partial results if it
+                was aborted.
         """
-        self.load_test_stats = LoadTestStats()
-        await self.generate_load(duration, qps or self.qps)  # Use self.qps if qps is None
+        qps = qps or self.qps  # Use self.qps if qps is None
+        self.load_test_stats.reset(max_error_rate, max_latency, qps * duration if qps else None)
+        await self.generate_load(duration, qps)
         self.load_test_stats.calculate_stats()
         return self.load_test_stats.error_rate, self.load_test_stats.mean_latency
 
+    async def _probe(self, duration: int, qps: int, max_error_rate: float, max_latency: float) -> bool:
+        """
+        Run a single test at the given QPS, print its results, and report whether the server kept up.
+
+        Args:
+            duration (int): The duration of the test in seconds.
+            qps (int): The number of queries per second to perform.
+            max_error_rate (float): The maximum acceptable error rate.
+            max_latency (float): The maximum acceptable mean latency in seconds.
+
+        Returns:
+            bool: Whether the error rate and mean latency were both within their thresholds. A test that was
+                aborted early always fails.
+        """
+        error_rate, mean_latency = await self.run_test(duration, qps, max_error_rate, max_latency)
+        aborted = self.load_test_stats.aborted
+        print(f"Tested QPS: {qps}, Error Rate: {error_rate:.2%}, Mean Latency: {mean_latency:.3f}s"
+              + (" (aborted early)" if aborted else ""))
+        return not aborted and error_rate <= max_error_rate and mean_latency <= max_latency
+
     async def find_breaking_point(self, max_qps: int, duration: int, max_error_rate: float, max_latency: float) -> int:
         """
-        Find the breaking point of the server using binary search and print the results of the search.
+        Find the breaking point of the server and print the results of the search.
+
+        The QPS is doubled from 1 until a test fails or max_qps is exceeded, and the breaking point is then
+        found by binary search between the last QPS that passed and the first one that failed. Each test takes
+        the full duration, so this needs far fewer tests than a binary search over [1, max_qps] when the
+        breaking point is well below max_qps.
 
         Args:
             max_qps (int): The maximum QPS to test.
@@ -110,17 +227,20 @@ class HTTPLoadTester:
         Returns:
             int: The maximum QPS the server can handle without exceeding the error rate or latency thresholds.
         """
-        low, high = 1, max_qps
         best_qps = 0
         print("Beginning search for breaking point.")
 
+        qps = 1
+        while qps <= max_qps:
+            if not await self._probe(duration, qps, max_error_rate, max_latency):
+                break
+            best_qps = qps
+            qps *= 2
+
+        low, high = best_qps + 1, min(qps - 1, max_qps)
         while low <= high:
             mid = (low + high) // 2
-            error_rate, mean_latency = await self.run_test(duration, mid)
-
-            print(f"Tested QPS: {mid}, Error Rate: {error_rate:.2%}, Mean Latency: {mean_latency:.3f}s")
-
-            if error_rate <= max_error_rate and mean_latency <= max_latency:
+            if await self._probe(duration, mid, max_error_rate, max_latency):
                 best_qps = mid
                 low = mid + 1
             else:
@@ -177,15 +297,32 @@ def parse_arguments():
     parser.add_argument("--max-error-rate", type=float, default=0.01, help="Maximum acceptable error rate when finding breaking point")
     parser.add_argument("--max-latency", type=float, default=0.5, help="Maximum acceptable mean latency in seconds when finding breaking point")
     parser.add_argument("--verbose", action="store_true", help="Print verbose output including error messages")
-    parser.add_argument("--retries", type=int, default=5, help="Number of retry attempts for a failed request")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Total timeout in seconds for a single request")
     return parser.parse_args()
 
 async def main() -> None:
     args = parse_arguments()
-    tester = HTTPLoadTester(args.url, args.qps, args.verbose, args.retries)
-    await tester.run(args)
+    tester = HTTPLoadTester(args.url, args.qps, args.verbose, timeout=args.timeout)
+    try:
+        await tester.run(args)
+    finally:
+        await tester.aclose()
 
-if __name__ == "__main__":
+def set_event_loop_policy() -> None:
+    """Use the libuv-based uvloop (or winloop on Windows) event loop if it is installed, as it dispatches faster."""
     if sys.platform.startswith('win'):
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        try:
+            import winloop
+            asyncio.set_event_loop_policy(winloop.EventLoopPolicy())
+        except ImportError:
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    else:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
+
+if __name__ == "__main__":
+    set_event_loop_policy()
     asyncio.run(main())
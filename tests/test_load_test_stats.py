@@ -1,12 +1,17 @@
 import unittest
 
+import numpy as np
+
+from app._stats_kernel import _is_error_py, is_error
 from app.load_test_stats import LoadTestStats
 
 
 class TestLoadTesterStats(unittest.TestCase):
     def test_calculate_results(self):
         load_test_stats = LoadTestStats()
-        load_test_stats.results = {'200': [0.1, 0.2, 0.3], '404': [0.4, 0.5], 'error': [0.6]}
+        results = [('200', 0.1), ('200', 0.2), ('200', 0.3), ('404', 0.4), ('404', 0.5), ('error', 0.6)]
+        for status, latency in results:
+            load_test_stats.add_result(status, latency)
 
         load_test_stats.calculate_stats()
 
@@ -18,3 +23,85 @@ class TestLoadTesterStats(unittest.TestCase):
         self.assertAlmostEqual(0.35, load_test_stats.median_latency)
         self.assertAlmostEqual(0.1, load_test_stats.min_latency)
         self.assertAlmostEqual(0.6, load_test_stats.max_latency)
+
+    def test_add_result_grows_buffers(self):
+        load_test_stats = LoadTestStats(initial_capacity=2)
+        for i in range(5):
+            load_test_stats.add_result('200', i / 10)
+
+        load_test_stats.calculate_stats()
+
+        self.assertEqual(5, load_test_stats.total_requests)
+        self.assertDictEqual({'200': 5}, load_test_stats.status_distribution)
+        self.assertAlmostEqual(0.2, load_test_stats.median_latency)
+        self.assertAlmostEqual(0.4, load_test_stats.max_latency)
+
+    def test_median_odd_and_even(self):
+        self.assertAlmostEqual(0.3, LoadTestStats._median(np.array([0.5, 0.1, 0.3])))
+        self.assertAlmostEqual(0.25, LoadTestStats._median(np.array([0.4, 0.1, 0.3, 0.2])))
+
+    def test_add_result_int(self):
+        load_test_stats = LoadTestStats()
+        load_test_stats.add_result_int(200, 0.1)
+        load_test_stats.add_result_int(503, 0.2)
+        load_test_stats.add_result_int(LoadTestStats.ERROR_STATUS, 0.3)
+
+        load_test_stats.calculate_stats()
+
+        self.assertEqual(2, load_test_stats.total_errors)
+        self.assertDictEqual({'200': 1, '503': 1, 'error': 1}, load_test_stats.status_distribution)
+
+    def test_reset(self):
+        load_test_stats = LoadTestStats(initial_capacity=2)
+        for i in range(5):
+            load_test_stats.add_result('500', i / 10)
+        load_test_stats.calculate_stats()
+        capacity = len(load_test_stats._lat)
+
+        load_test_stats.reset()
+        load_test_stats.add_result('200', 0.7)
+        load_test_stats.calculate_stats()
+
+        self.assertEqual(capacity, len(load_test_stats._lat))
+        self.assertEqual(1, load_test_stats.total_requests)
+        self.assertEqual(0, load_test_stats.total_errors)
+        self.assertDictEqual({'200': 1}, load_test_stats.status_distribution)
+        self.assertAlmostEqual(0.7, load_test_stats.min_latency)
+
+    def test_aborted(self):
+        load_test_stats = LoadTestStats()
+        load_test_stats.reset(max_error_rate=0.01, max_latency=0.5, expected_requests=1000)
+        for _ in range(10):
+            load_test_stats.add_result('error', 0.1)
+        self.assertFalse(load_test_stats.aborted)  # Still within the budget of 10 errors
+
+        load_test_stats.add_result('error', 0.1)
+        self.assertTrue(load_test_stats.aborted)
+
+        load_test_stats.reset(max_error_rate=0.01, max_latency=0.5, expected_requests=10)
+        for _ in range(5):
+            load_test_stats.add_result('200', 1.1)
+        self.assertTrue(load_test_stats.aborted)  # Mean latency of 10 requests can no longer be 0.5s
+
+        load_test_stats.reset()
+        for _ in range(100):
+            load_test_stats.add_result('error', 10.0)
+        self.assertFalse(load_test_stats.aborted)  # No thresholds given
+
+    def test_early_errors_do_not_abort_passing_test(self):
+        load_test_stats = LoadTestStats()
+        load_test_stats.reset(max_error_rate=0.01, max_latency=0.5, expected_requests=1000)
+        for i in range(1000):
+            load_test_stats.add_result('error' if i < 3 else '200', 0.1)
+
+        load_test_stats.calculate_stats()
+
+        self.assertFalse(load_test_stats.aborted)
+        self.assertAlmostEqual(0.003, load_test_stats.error_rate)
+
+    def test_is_error(self):
+        for check in (is_error, _is_error_py):
+            for status in (LoadTestStats.ERROR_STATUS, 400, 404, 500, 599):
+                self.assertTrue(check(status), status)
+            for status in (100, 200, 301, 399, 600):
+                self.assertFalse(check(status), status)
@@ -1,4 +1,8 @@
+import asyncio
 import asynctest
+import itertools
+import math
+import time
 from unittest.mock import patch, AsyncMock, MagicMock
 from app.load_test_stats import LoadTestStats
 from app.load_tester import HTTPLoadTester
@@ -15,40 +19,126 @@ class TestHTTPLoadTester(asynctest.TestCase):
         self.assertEqual(self.tester.qps, self.qps)
         self.assertIsInstance(self.tester.load_test_stats, LoadTestStats)
 
+    async def test_get_connector_reuses_connector(self):
+        connector = await self.tester._get_connector()
+        self.assertIs(connector, await self.tester._get_connector())
+
+        await self.tester.aclose()
+
+        self.assertTrue(connector.closed)
+        self.assertIsNone(self.tester._connector)
+
+    @patch('app.load_tester.HTTPLoadTester.make_request', new_callable=AsyncMock)
+    async def test_generate_load_shares_connector(self, mock_make_request):
+        connectors = {}
+        async def record_connector(session, start_time):
+            connectors[session] = session.connector
+        mock_make_request.side_effect = record_connector
+
+        await self.tester.generate_load(duration=1)
+        await self.tester.generate_load(duration=1)
+
+        self.assertEqual(2, len(connectors))  # A fresh session per test
+        for session, connector in connectors.items():
+            self.assertTrue(session.closed)
+            self.assertIs(self.tester._connector, connector)
+        self.assertFalse(self.tester._connector.closed)
+
+        await self.tester.aclose()
+
     @asynctest.patch('aiohttp.ClientSession')
     async def test_make_request_success(self, mock_session):
         mock_response = AsyncMock()
         mock_response.status = 200
-        mock_response.text.return_value = "Response content"
+        mock_response.read.return_value = b"Response content"
         mock_session.get.return_value.__aenter__.return_value = mock_response
 
         await self.tester.make_request(mock_session)
+        self.tester.load_test_stats.calculate_stats()
 
-        self.assertEqual(1, len(self.tester.load_test_stats.results['200']))
-        self.assertNotIn('error', self.tester.load_test_stats.results)
+        self.assertDictEqual({'200': 1}, self.tester.load_test_stats.status_distribution)
+        mock_response.read.assert_awaited_once()
+        mock_response.text.assert_not_called()
 
     @asynctest.patch('aiohttp.ClientSession')
-    async def test_make_request_error(self, mock_session):
+    async def test_make_request_measures_from_start_time(self, mock_session):
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        mock_session.get.return_value.__aenter__.return_value = mock_response
+
+        with patch('time.perf_counter', return_value=1.5):
+            await self.tester.make_request(mock_session, start_time=1.0)
+        self.tester.load_test_stats.calculate_stats()
+
+        self.assertAlmostEqual(0.5, self.tester.load_test_stats.mean_latency)
+
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    @asynctest.patch('aiohttp.ClientSession')
+    async def test_make_request_error(self, mock_session, mock_sleep):
         mock_session.get.side_effect = Exception("Connection error")
 
         await self.tester.make_request(mock_session)
+        self.tester.load_test_stats.calculate_stats()
+
+        self.assertDictEqual({'error': 1}, self.tester.load_test_stats.status_distribution)
+        # The failed request is recorded straight away, without being retried
+        mock_session.get.assert_called_once()
+        mock_sleep.assert_not_awaited()
+
+    def test_init_timeout_is_keyword_only(self):
+        with self.assertRaises(TypeError):
+            HTTPLoadTester(self.url, self.qps, False, 5)
 
-        self.assertEqual(1, len(self.tester.load_test_stats.results['error']))
+        tester = HTTPLoadTester(self.url, self.qps, timeout=5)
+        self.assertEqual(5, tester.timeout)
 
     @patch('asyncio.sleep', new_callable=AsyncMock)
     @patch('app.load_tester.HTTPLoadTester.make_request', new_callable=AsyncMock)
     @patch('aiohttp.ClientSession')
     async def test_generate_load_basic(self, mock_session, mock_make_request, mock_sleep):
-        # Create a mock time function that increments by 0.01 seconds each call
-        mock_time = MagicMock()
-        mock_time.side_effect = [0.01 * i for i in range(600)]  # Simulate 6 seconds with fine granularity
+        # Create a mock clock that increments by 0.01 seconds each call
+        ticks = itertools.count()
+        mock_time = MagicMock(side_effect=lambda: 0.01 * next(ticks))
 
-        with patch('time.time', mock_time):
+        with patch('time.perf_counter', mock_time):
             tester = HTTPLoadTester(url="http://example.com", qps=5)
             await tester.generate_load(duration=5)
 
         self.assertEqual(25, mock_make_request.call_count)
 
+    @patch('aiohttp.ClientSession')
+    async def test_generate_load_latency_with_coarse_clock(self, mock_session):
+        # A clock with only 10 millisecond resolution: latencies are still never negative, because requests are
+        # scheduled and timed on the same clock
+        coarse_time = MagicMock(side_effect=lambda: math.floor(time.monotonic() * 100) / 100)
+        mock_response = AsyncMock()
+        mock_response.status = 200
+        session = mock_session.return_value.__aenter__.return_value
+        session.get = MagicMock()
+        session.get.return_value.__aenter__ = AsyncMock(return_value=mock_response)
+
+        with patch('time.perf_counter', coarse_time):
+            await self.tester.generate_load(duration=1, qps=50)
+        self.tester.load_test_stats.calculate_stats()
+
+        self.assertDictEqual({'200': 50}, self.tester.load_test_stats.status_distribution)
+        self.assertGreaterEqual(self.tester.load_test_stats.min_latency, 0)
+
+    @patch('app.load_tester.HTTPLoadTester.make_request', new_callable=AsyncMock)
+    @patch('aiohttp.ClientSession')
+    async def test_generate_load_adds_workers_for_slow_requests(self, mock_session, mock_make_request):
+        # Requests take longer than a second, so more than QPS of them must be in flight at once
+        start_delays = []
+        async def slow_request(session, start_time):
+            start_delays.append(time.perf_counter() - start_time)
+            await asyncio.sleep(1.2)
+        mock_make_request.side_effect = slow_request
+
+        await self.tester.generate_load(duration=2, qps=4)
+
+        self.assertEqual(8, mock_make_request.call_count)
+        self.assertLess(max(start_delays), 0.1)  # No request waited for a worker to become free
+
     async def test_generate_load_raises_value_error(self):
         # Create a new tester instance with None qps
         tester_with_none_qps = HTTPLoadTester(self.url, None)
@@ -86,8 +176,11 @@ class TestHTTPLoadTester(asynctest.TestCase):
 
         breaking_point = await self.tester.find_breaking_point(max_qps, duration, max_error_rate, max_latency)
 
-        self.assertEqual(91, breaking_point)  # Expected breaking point
+        self.assertEqual(6, breaking_point)  # Expected breaking point
         self.assertLessEqual(self.tester.run_test.call_count, len(mock_results))
+        # Doubles until QPS 8 fails, then bisects between 4 and 8 before rerunning the best QPS
+        tested_qps = [call.args[1] for call in self.tester.run_test.call_args_list]
+        self.assertListEqual([1, 2, 4, 8, 6, 7, 6], tested_qps)
         mock_print_results.assert_called_once()
 
         # Expanded list of mock results for the failure case
@@ -114,6 +207,55 @@ class TestHTTPLoadTester(asynctest.TestCase):
         self.assertLessEqual(self.tester.run_test.call_count, len(mock_results_fail))
         mock_print_results.assert_called_once()
 
+    @patch('app.load_tester.HTTPLoadTester.make_request', new_callable=AsyncMock)
+    @patch('aiohttp.ClientSession')
+    async def test_generate_load_stops_when_aborted(self, mock_session, mock_make_request):
+        async def fail(session, start_time):
+            self.tester.load_test_stats.abort()
+        mock_make_request.side_effect = fail
+
+        start_time = self.loop.time()
+        await self.tester.generate_load(duration=5)
+
+        self.assertLess(self.loop.time() - start_time, 1)
+        self.assertLessEqual(mock_make_request.call_count, 2 * self.qps)
+
+    @patch('app.load_tester.HTTPLoadTester.make_request', new_callable=AsyncMock)
+    @patch('aiohttp.ClientSession')
+    async def test_run_test_aborts_requests_outlasting_duration(self, mock_session, mock_make_request):
+        # Like a hung server, every request fails only after the test's duration is over
+        async def hung_request(session, start_time):
+            await asyncio.sleep(2)
+            self.tester.load_test_stats.add_result_int(LoadTestStats.ERROR_STATUS, time.perf_counter() - start_time)
+        mock_make_request.side_effect = hung_request
+
+        start_time = time.perf_counter()
+        await self.tester.run_test(1, 10, max_error_rate=0.01, max_latency=0.5)
+
+        # The first error exceeds the error budget, so the other requests are cancelled instead of awaited
+        self.assertLess(time.perf_counter() - start_time, 2.5)
+        self.assertTrue(self.tester.load_test_stats.aborted)
+        self.assertLess(self.tester.load_test_stats.total_requests, 10)
+
+    async def test_probe_fails_when_aborted(self):
+        async def run_test(duration, qps, max_error_rate, max_latency):
+            self.tester.load_test_stats.abort()
+            return 0.0, 0.1
+        self.tester.run_test = run_test
+
+        self.assertFalse(await self.tester._probe(5, 10, 0.01, 0.5))
+
+    @asynctest.patch('app.load_tester.HTTPLoadTester.print_results')
+    async def test_find_breaking_point_not_found(self, mock_print_results):
+        self.tester.run_test = AsyncMock(return_value=(0.0, 0.1))
+
+        breaking_point = await self.tester.find_breaking_point(100, 5, 0.01, 0.5)
+
+        self.assertEqual(100, breaking_point)
+        tested_qps = [call.args[1] for call in self.tester.run_test.call_args_list]
+        self.assertListEqual([1, 2, 4, 8, 16, 32, 64], tested_qps[:7])
+        self.assertEqual(100, tested_qps[-2])  # Last QPS tested by the search, before the final test
+
     def test_print_results(self):
         self.tester.load_test_stats.total_requests = 100
         self.tester.load_test_stats.total_errors = 5